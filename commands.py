@@ -1,26 +1,149 @@
 import os
+import stat
 import subprocess
 import sys
 import platform
 
 import json
+import pickle
 import requests
 import re
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 
 import sublime
 import sublime_plugin
 
 
+def load_conda_settings(window):
+    """Load the platform-specific plugin settings for the given window."""
+    env_vars = window.extract_variables()
+    filename = 'Conda (${platform}).sublime-settings'
+    expanded = sublime.expand_variables(filename, env_vars)
+    return sublime.load_settings(expanded)
+
+
+def conda_base_directory(executable):
+    """Retrieve the directory of conda's base environment from its python executable."""
+    if sys.platform == 'win32':
+        base_directory = os.path.dirname(executable)
+    else:
+        base_directory = os.path.dirname(executable).rstrip('bin')
+
+    return base_directory
+
+
+def conda_startupinfo():
+    """Retrieve the startup info used to hide command prompts on Windows platforms."""
+    startupinfo = None
+
+    if sys.platform == 'win32':
+        startupinfo = subprocess.STARTUPINFO()
+
+        if sys.version_info.major == 3:
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        else:
+            startupinfo.dwFlags |= subprocess._subprocess.STARTF_USESHOWWINDOW
+
+    return startupinfo
+
+
+# :type       dict[str, dict]:  Used to cache the output of `conda info --json`
+#                               per python executable.
+_conda_info = {}
+
+
+def load_conda_info(executable, refresh=False):
+    """Retrieve conda's environments and package caches from conda info.
+
+    The result is cached per executable and only retrieved again when
+    refresh is True. An empty dictionary is returned if conda fails.
+    """
+    if refresh or executable not in _conda_info:
+        try:
+            response = subprocess.check_output(
+                [executable, '-m', 'conda', 'info', '--json'],
+                startupinfo=conda_startupinfo())
+
+            _conda_info[executable] = json.loads(response.decode())
+
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return {}
+
+    return _conda_info[executable]
+
+
+SITE_PACKAGES_PATTERN = re.compile(r'^(?:(?:lib/python\d+\.\d+|Lib)/)?site-packages/([^/]+)(/)?')
+STDLIB_PATTERN = re.compile(r'^(?:lib/python\d+\.\d+(?:/lib-dynload)?|Lib|DLLs)/([^/]+)(/)?')
+EXTENSION_PATTERN = re.compile(r'\.(?:py|pyc|so|pyd)$')
+
+
+def module_name(name, is_directory):
+    """Convert a top-level site-packages entry into an importable module name."""
+    if not is_directory:
+        if EXTENSION_PATTERN.search(name) is None:
+            return None
+        name = name.split('.')[0]
+
+    if name.isidentifier() and name != '__pycache__':
+        return name
+
+    return None
+
+
+def top_level_modules(filenames, pattern=SITE_PACKAGES_PATTERN):
+    """List the top-level module names provided by a package's file list."""
+    modules = set()
+
+    for filename in filenames:
+        match = pattern.match(filename.replace('\\', '/'))
+
+        if match is not None and match.group(1) != 'site-packages':
+            module = module_name(match.group(1), match.group(2) is not None)
+            if module is not None:
+                modules.add(module)
+
+    return sorted(modules)
+
+
+def refresh_entries(directory, entries, is_entry, read_entry):
+    """Re-read the entries of directory whose mtime changed.
+
+    Returns a dictionary mapping each entry name to its mtime, the package
+    that provides it and the module names it provides.
+    """
+    refreshed = {}
+
+    try:
+        names = [name for name in os.listdir(directory) if is_entry(name)]
+    except OSError:
+        names = []
+
+    for name in names:
+        path = os.path.join(directory, name)
+
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+
+        if name in entries and entries[name][0] == mtime:
+            refreshed[name] = entries[name]
+        else:
+            package, modules = read_entry(path)
+            refreshed[name] = (mtime, package, modules)
+
+    return refreshed
+
+
 class CondaCommand(sublime_plugin.WindowCommand):
     """Contains all of the attributes that will be inherited by other commands."""
 
     @property
     def settings(self):
         """Load the platform-specific plugin settings for commands to use."""
-        env_vars = self.window.extract_variables()
-        filename = 'Conda (${platform}).sublime-settings'
-        expanded = sublime.expand_variables(filename, env_vars)
-        return sublime.load_settings(expanded)
+        return load_conda_settings(self.window)
 
     @property
     def executable(self):
@@ -35,12 +158,7 @@ class CondaCommand(sublime_plugin.WindowCommand):
     @property
     def base_directory(self):
         """Retrieve the directory of conda's base environment."""
-        if sys.platform == 'win32':
-            base_directory = os.path.dirname(self.executable)
-        else:
-            base_directory = os.path.dirname(self.executable).rstrip('bin')
-
-        return base_directory
+        return conda_base_directory(self.executable)
 
     @property
     def conda_environments(self):
@@ -68,17 +186,7 @@ class CondaCommand(sublime_plugin.WindowCommand):
     @property
     def startupinfo(self):
         """Property used to hide command prompts when on Windows platforms."""
-        startupinfo = None
-
-        if sys.platform == 'win32':
-            startupinfo = subprocess.STARTUPINFO()
-
-            if sys.version_info.major == 3:
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            else:
-                startupinfo.dwFlags |= subprocess._subprocess.STARTF_USESHOWWINDOW
-
-        return startupinfo
+        return conda_startupinfo()
 
     def retrieve_environment_name(self, path):
         """Retrieve the environment name from the active environment path.
@@ -173,6 +281,314 @@ class RemoveCondaEnvironmentCommand(CondaCommand):
             self.window.run_command('exec', {'cmd': cmd})
 
 
+class ShowCondaDiskUsageCommand(CondaCommand):
+    """Contains the methods needed to show the disk usage of conda."""
+
+    @property
+    def cache_file(self):
+        """Retrieve the path of the file used to persist directory scans."""
+        return os.path.join(sublime.cache_path(), 'Conda', 'disk_usage.pickle')
+
+    def run(self):
+        """Display 'Conda: Disk Usage' in Sublime Text's command palette.
+
+        When 'Conda: Disk Usage' is clicked by the user, every conda
+        environment and package cache directory is scanned in the
+        background and a report of the space each one uses is opened
+        in a new tab.
+        """
+        sublime.status_message('Scanning conda disk usage...')
+        sublime.set_timeout_async(self.report_disk_usage, 0)
+
+    def load_cache(self):
+        """Load the persisted directory scans from a previous run.
+
+        Each entry is keyed by directory path and holds the directory
+        mtime, its device, an array of inode and size pairs for its files
+        and the names of its subdirectories.
+        """
+        try:
+            with open(self.cache_file, 'rb') as cache:
+                return pickle.load(cache)
+
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return {}
+
+    def save_cache(self, cache):
+        """Persist the directory scans of the current run."""
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+
+            with open(self.cache_file, 'wb') as cache_file:
+                pickle.dump(cache, cache_file, pickle.HIGHEST_PROTOCOL)
+
+        except OSError:
+            pass
+
+    def stat_directory(self, directory, status):
+        """Stat every entry of a single directory without following symlinks.
+
+        Files are stored as inode and size pairs along with the device of
+        the directory, so hardlinks to the same data can be counted once.
+        Files on platforms without inode numbers are stored with inode 0.
+        """
+        files, subdirectories = array('Q'), []
+
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            names = []
+
+        for name in names:
+            try:
+                file_status = os.lstat(os.path.join(directory, name))
+            except OSError:
+                continue
+
+            if stat.S_ISDIR(file_status.st_mode):
+                subdirectories.append(name)
+            else:
+                files.extend((file_status.st_ino, file_status.st_size))
+
+        return (status.st_mtime, status.st_dev, files, tuple(subdirectories))
+
+    def scan_directory(self, path, excluded, previous, current):
+        """Collect the inodes and sizes of the files found beneath path.
+
+        Directories whose mtime is unchanged since the previous scan are
+        taken from the cache instead of being listed and stat'ed again.
+        The paths in excluded are scanned on their own and are skipped here.
+        Returns the size of each inode, the bytes of files without an inode
+        number, the apparent size and whether any directory was re-scanned.
+        Files without an inode number cannot be matched to their hardlinks,
+        such as on Windows before Python 3.5.
+        """
+        inodes, unindexed, apparent, changed = {}, 0, 0, False
+        directories = [path]
+
+        while directories:
+            directory = directories.pop()
+
+            try:
+                status = os.lstat(directory)
+            except OSError:
+                continue
+
+            entry = previous.get(directory)
+            if entry is None or entry[0] != status.st_mtime:
+                entry = self.stat_directory(directory, status)
+                changed = True
+
+            current[directory] = entry
+            _, device, files, subdirectories = entry
+
+            for i in range(0, len(files), 2):
+                inode, size = files[i], files[i + 1]
+                apparent += size
+
+                if inode:
+                    inodes[device << 64 | inode] = size
+                else:
+                    unindexed += size
+
+            for name in subdirectories:
+                subdirectory = os.path.join(directory, name)
+                if subdirectory not in excluded:
+                    directories.append(subdirectory)
+
+        return inodes, unindexed, apparent, changed
+
+    def disk_usage_units(self, info):
+        """List every environment, cached package and package cache remainder.
+
+        Extracted packages are recognised by their info directory. Anything
+        else inside a package cache, such as tarballs and the index cache,
+        is grouped under the package cache directory itself.
+        """
+        root = os.path.normpath(info.get('root_prefix', self.base_directory))
+        environments = info.get('envs') or [path for _, path in self.conda_environments]
+        directories = info.get('pkgs_dirs') or [os.path.join(root, 'pkgs')]
+
+        units = []
+        for path in environments:
+            path = os.path.normpath(path)
+            name = 'base' if path == root else os.path.basename(path)
+            units.append(['environment', name, path])
+
+        for directory in directories:
+            directory = os.path.normpath(directory)
+
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                continue
+
+            units.append(['cache', directory, directory])
+
+            for name in names:
+                path = os.path.join(directory, name)
+
+                if os.path.isdir(os.path.join(path, 'info')):
+                    units.append(['package', name, path])
+
+        return root, units
+
+    def report_disk_usage(self):
+        """Scan conda's directories and open the report in a new tab."""
+        try:
+            report = self.scan_disk_usage()
+
+        except OSError as error:
+            sublime.status_message('Conda disk usage scan failed: {}'.format(error))
+
+        else:
+            sublime.set_timeout(lambda: self.show_report(report), 0)
+
+    def scan_disk_usage(self):
+        """Scan all units in parallel and format the resulting report.
+
+        The base environment's envs and pkgs directories are never counted
+        as part of base, even when they are not listed by conda.
+        """
+        root, units = self.disk_usage_units(load_conda_info(self.executable, refresh=True))
+        excluded = set(path for _, _, path in units)
+        excluded.update((os.path.join(root, 'envs'), os.path.join(root, 'pkgs')))
+
+        previous, current = self.load_cache(), {}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            scans = list(executor.map(
+                lambda unit: self.scan_directory(unit[2], excluded, previous, current),
+                units))
+
+        if any(changed for _, _, _, changed in scans) or previous.keys() != current.keys():
+            self.save_cache(current)
+
+        del previous, current
+
+        # hardlinks inside a single unit are counted once, while inodes
+        # referenced by more than one unit are reported as shared
+        references, sizes = {}, {}
+        for inodes, _, _, _ in scans:
+            sizes.update(inodes)
+            for key in inodes:
+                references[key] = references.get(key, 0) + 1
+
+        # without inode numbers hardlinks cannot be told apart from copies,
+        # so unique and actual sizes are unknown rather than overstated
+        linked = not any(unindexed for _, unindexed, _, _ in scans)
+
+        usage = []
+        for (kind, name, _), (inodes, unindexed, _, _) in zip(units, scans):
+            total = sum(inodes.values()) + unindexed
+            if linked:
+                unique = sum(size for key, size in inodes.items() if references[key] == 1)
+            else:
+                unique = None
+            usage.append([kind, name, total, unique])
+
+        apparent = sum(scan[2] for scan in scans)
+        actual = sum(sizes.values()) if linked else None
+
+        return self.format_report(usage, apparent, actual)
+
+    def format_report(self, usage, apparent, actual):
+        """Format the disk usage of each unit along with cleanup suggestions.
+
+        When hardlinks could not be detected, actual is None and only the
+        total size of each unit is reported, without suggestions.
+        """
+        size = self.format_size
+
+        environments = [unit for unit in usage if unit[0] == 'environment']
+        packages = [unit for unit in usage if unit[0] == 'package']
+        caches = [unit for unit in usage if unit[0] == 'cache']
+
+        if actual is None:
+            return self.format_totals(environments, packages, apparent)
+
+        row = '{:<50} {:>10} {:>10} {:>10}'
+        header = row.format('', 'Total', 'Unique', 'Shared')
+
+        lines = ['Conda Disk Usage', '================', '',
+                 'Apparent size (hardlinks counted each time): {}'.format(size(apparent)),
+                 'Actual size (hardlinks counted once):        {}'.format(size(actual)),
+                 '',
+                 'Unique bytes are freed when the entry is removed. Shared bytes are',
+                 'hardlinked into other environments or the package cache and stay on disk.',
+                 '', 'Environments', '------------', header]
+
+        for _, name, total, unique in sorted(environments, key=lambda unit: -unit[3]):
+            lines.append(row.format(name, size(total), size(unique), size(total - unique)))
+
+        lines.extend(['', 'Packages', '--------', header])
+
+        for _, name, total, unique in sorted(packages, key=lambda unit: -unit[2]):
+            lines.append(row.format(name, size(total), size(unique), size(total - unique)))
+
+        unused = [unit for unit in packages if unit[2] and unit[2] == unit[3]]
+        tarballs = sum(unit[3] for unit in caches)
+
+        lines.extend(['', 'Suggestions', '-----------'])
+
+        if unused:
+            lines.append('{} cached package(s) not linked into any environment. '
+                         '`conda clean --packages` frees {}.'
+                         .format(len(unused), size(sum(unit[3] for unit in unused))))
+
+        if tarballs:
+            lines.append('Tarballs and index caches use {}. '
+                         '`conda clean --tarballs --index-cache` frees them.'
+                         .format(size(tarballs)))
+
+        removable = [unit for unit in environments if unit[1] != 'base']
+        for _, name, total, unique in sorted(removable, key=lambda unit: -unit[3])[:3]:
+            if unique:
+                lines.append("Removing environment '{}' frees {} of its {}."
+                             .format(name, size(unique), size(total)))
+
+        return '\n'.join(lines) + '\n'
+
+    def format_totals(self, environments, packages, apparent):
+        """Format the total size of each unit when hardlinks cannot be detected."""
+        size = self.format_size
+        row = '{:<50} {:>10}'
+
+        lines = ['Conda Disk Usage', '================', '',
+                 'Apparent size (hardlinks counted each time): {}'.format(size(apparent)),
+                 '',
+                 'Hardlinks cannot be detected on this platform, so the space freed by',
+                 'removing an entry is unknown and no cleanup is suggested.',
+                 '', 'Environments', '------------', row.format('', 'Total')]
+
+        for _, name, total, _ in sorted(environments, key=lambda unit: -unit[2]):
+            lines.append(row.format(name, size(total)))
+
+        lines.extend(['', 'Packages', '--------', row.format('', 'Total')])
+
+        for _, name, total, _ in sorted(packages, key=lambda unit: -unit[2]):
+            lines.append(row.format(name, size(total)))
+
+        return '\n'.join(lines) + '\n'
+
+    def format_size(self, size):
+        """Format a number of bytes as a human readable string."""
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if size < 1024:
+                return '{:.1f} {}'.format(size, unit)
+            size /= 1024
+
+        return '{:.1f} TB'.format(size)
+
+    def show_report(self, report):
+        """Open the disk usage report in a new scratch tab."""
+        view = self.window.new_file()
+        view.set_name('Conda Disk Usage')
+        view.set_scratch(True)
+        view.run_command('append', {'characters': report})
+        view.set_read_only(True)
+
+
 class ListCondaEnvironmentCommand(CondaCommand):
     """Contains the methods needed to list available conda environments."""
 
@@ -441,9 +857,13 @@ class ListCondaPackageCommand(CondaCommand):
 class InstallCondaPackageCommand(CondaCommand):
     """Contains all of the methods needed to install a conda package."""
 
-    def run(self):
-        """Display an input box allowing the user to input a package name."""
-        self.window.show_input_panel('Package Name:', '', self.install_package,
+    def run(self, package=''):
+        """Display an input box allowing the user to input a package name.
+
+        The input box is prefilled with package when it is given, such as
+        when installing the package that provides an unresolved import.
+        """
+        self.window.show_input_panel('Package Name:', package, self.install_package,
                                      None, None)
 
     def install_package(self, package):
@@ -681,3 +1101,455 @@ class ExecuteCondaEnvironmentCommand(CondaCommand):
 
         with self:
             self.window.run_command('exec', kwargs)
+
+
+class CondaModuleIndex(object):
+    """Index of the top-level module names importable from a conda environment.
+
+    Module names are gathered from the file lists in conda-meta, the
+    top_level.txt or RECORD files of distributions installed without conda,
+    and the interpreter's builtin modules. Each name maps to the package
+    that provides it so that lookups are a single dictionary access.
+    """
+
+    # :type       dict[str, CondaModuleIndex]:  Used to cache one index per
+    #                                           environment path.
+    _indexes = {}
+
+    def __init__(self, environment):
+        self.environment = environment
+        self.conda_meta = os.path.join(environment, 'conda-meta')
+        self.conda_meta_mtime = None
+        self.site_packages_mtime = None
+        self.conda_records = {}
+        self.distributions = {}
+        self.modules = dict.fromkeys(sys.builtin_module_names, 'python')
+
+    @classmethod
+    def for_environment(cls, environment):
+        """Retrieve the refreshed index of the given environment path."""
+        environment = os.path.normpath(os.path.expanduser(environment))
+
+        if environment not in cls._indexes:
+            cls._indexes[environment] = cls(environment)
+
+        index = cls._indexes[environment]
+        index.refresh()
+
+        return index
+
+    @property
+    def site_packages(self):
+        """Retrieve the site-packages directory of the newest python in the environment."""
+        if sys.platform == 'win32':
+            return os.path.join(self.environment, 'Lib', 'site-packages')
+
+        library = os.path.join(self.environment, 'lib')
+        versions = []
+
+        try:
+            for name in os.listdir(library):
+                match = re.match(r'^python(\d+)\.(\d+)$', name)
+                if match is not None:
+                    versions.append((int(match.group(1)), int(match.group(2)), name))
+
+        except OSError:
+            pass
+
+        if not versions:
+            return None
+
+        return os.path.join(library, max(versions)[2], 'site-packages')
+
+    def __contains__(self, module):
+        """Return True if the top-level module can be imported in the environment."""
+        return module in self.modules
+
+    def refresh(self):
+        """Rebuild the index if conda-meta or site-packages changed.
+
+        Only the conda-meta records and distributions whose mtime changed
+        since the last refresh are read again.
+        """
+        try:
+            conda_meta_mtime = os.stat(self.conda_meta).st_mtime
+        except OSError:
+            conda_meta_mtime = None
+
+        site_packages = self.site_packages
+        try:
+            site_packages_mtime = os.stat(site_packages).st_mtime
+        except (OSError, TypeError):
+            site_packages_mtime = None
+
+        if (conda_meta_mtime == self.conda_meta_mtime and
+                site_packages_mtime == self.site_packages_mtime):
+            return
+
+        if conda_meta_mtime is not None:
+            self.conda_records = refresh_entries(
+                self.conda_meta, self.conda_records,
+                lambda name: name.endswith('.json'), self.read_conda_record)
+
+        if site_packages_mtime is not None:
+            self.distributions = refresh_entries(
+                site_packages, self.distributions,
+                lambda name: name.endswith(('.dist-info', '.egg-info')),
+                self.read_distribution)
+
+        modules = dict.fromkeys(sys.builtin_module_names, 'python')
+        for records in (self.distributions, self.conda_records):
+            for _, package, names in records.values():
+                modules.update(dict.fromkeys(names, package))
+
+        self.modules = modules
+        self.conda_meta_mtime = conda_meta_mtime
+        self.site_packages_mtime = site_packages_mtime
+
+    def read_conda_record(self, path):
+        """Read the package name and module names from a conda-meta record."""
+        try:
+            with open(path, encoding='utf-8') as record:
+                metadata = json.load(record)
+
+        except (OSError, ValueError):
+            return None, []
+
+        package = metadata.get('name')
+        pattern = STDLIB_PATTERN if package == 'python' else SITE_PACKAGES_PATTERN
+
+        return package, top_level_modules(metadata.get('files', []), pattern)
+
+    def read_distribution(self, path):
+        """Read the distribution name and module names from a dist-info directory."""
+        package = os.path.basename(path).split('-')[0].lower().replace('_', '-')
+
+        try:
+            with open(os.path.join(path, 'top_level.txt'), encoding='utf-8') as top_level:
+                return package, sorted(set(line.strip() for line in top_level if line.strip()))
+
+        except OSError:
+            pass
+
+        modules = set()
+        try:
+            with open(os.path.join(path, 'RECORD'), encoding='utf-8') as record:
+                for line in record:
+                    parts = line.split(',')[0].split('/')
+                    module = module_name(parts[0], len(parts) > 1)
+                    if module is not None and not parts[0].endswith(('.dist-info', '.data')):
+                        modules.add(module)
+
+        except OSError:
+            pass
+
+        return package, sorted(modules)
+
+
+class CondaPackageCacheIndex(object):
+    """Index of the top-level module names provided by conda's cached packages.
+
+    Every extracted package in the package cache directories lists its files
+    in info/paths.json or info/files. Each module name maps to the package
+    that provides it so that unresolved imports can be matched to a package
+    to install.
+    """
+
+    # :type       CondaPackageCacheIndex:  The most recently built index, read
+    #                                      by lookups while a new one is built.
+    _index = None
+
+    # :type       bool:  Used to only build one index at a time.
+    _building = False
+
+    # packages whose import name differs from their conda package name and
+    # that are not found in the package cache
+    aliases = {
+        'bs4': 'beautifulsoup4',
+        'cv2': 'opencv',
+        'dateutil': 'python-dateutil',
+        'PIL': 'pillow',
+        'skimage': 'scikit-image',
+        'sklearn': 'scikit-learn',
+        'yaml': 'pyyaml',
+    }
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.mtimes = {}
+        self.packages = {}
+        self.modules = {}
+
+    @classmethod
+    def package_for(cls, module):
+        """Retrieve the name of the conda package most likely to provide module.
+
+        Until the index has been built only the aliases are consulted.
+        """
+        modules = cls._index.modules if cls._index is not None else {}
+        return modules.get(module) or cls.aliases.get(module, module.lower())
+
+    @classmethod
+    def refresh_in_background(cls, executable, on_change):
+        """Build or refresh the index on its own thread.
+
+        The package cache directories are taken from conda's pkgs_dirs.
+        on_change is called once the refreshed index provides new modules.
+        """
+        if cls._building:
+            return
+
+        cls._building = True
+
+        def build():
+            try:
+                info = load_conda_info(executable)
+                directories = (info.get('pkgs_dirs') or
+                               [os.path.join(conda_base_directory(executable), 'pkgs')])
+                directories = tuple(os.path.normpath(directory) for directory in directories)
+
+                index = cls._index
+                if index is None or index.directories != directories:
+                    index = cls(directories)
+
+                changed = index.refresh()
+                cls._index = index
+
+            finally:
+                cls._building = False
+
+            if changed:
+                on_change()
+
+        thread = threading.Thread(target=build)
+        thread.daemon = True
+        thread.start()
+
+    def refresh(self):
+        """Read the packages extracted since the last refresh.
+
+        Package cache directories are only listed again when their mtime
+        changed, and only packages whose mtime changed are read again.
+        Returns True if the module names may have changed.
+        """
+        changed = False
+
+        for directory in self.directories:
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+
+            if self.mtimes.get(directory) == mtime:
+                continue
+
+            self.packages[directory] = refresh_entries(
+                directory, self.packages.get(directory, {}),
+                lambda name: os.path.isdir(os.path.join(directory, name, 'info')),
+                self.read_package)
+
+            self.mtimes[directory] = mtime
+            changed = True
+
+        if not changed:
+            return False
+
+        # prefer the package named after the module over packages that
+        # merely bundle it
+        packages = [(package, names) for entries in self.packages.values()
+                    for _, package, names in entries.values() if package is not None]
+
+        modules = {}
+        for package, names in sorted(packages):
+            for name in names:
+                if name not in modules or package == name.lower():
+                    modules[name] = package
+
+        self.modules = modules
+
+        return True
+
+    def read_package(self, path):
+        """Read the package name and module names from an extracted package."""
+        info = os.path.join(path, 'info')
+
+        try:
+            with open(os.path.join(info, 'index.json'), encoding='utf-8') as index:
+                package = json.load(index)['name']
+
+        except (OSError, ValueError, KeyError):
+            return None, []
+
+        try:
+            with open(os.path.join(info, 'paths.json'), encoding='utf-8') as paths:
+                filenames = [entry['_path'] for entry in json.load(paths)['paths']]
+
+        except (OSError, ValueError, KeyError):
+            try:
+                with open(os.path.join(info, 'files'), encoding='utf-8') as files:
+                    filenames = [line.strip() for line in files]
+
+            except OSError:
+                filenames = []
+
+        return package, top_level_modules(filenames)
+
+
+class CondaImportsViewEventListener(sublime_plugin.ViewEventListener):
+    """Flag imports that cannot be resolved in the activated conda environment."""
+
+    import_pattern = re.compile(r'(?:^|;)[ \t]*(?:from[ \t]+(\w+)|import[ \t]+([\w. \t,]+))', re.M)
+    module_pattern = re.compile(r'(?:^|,)\s*(\w+)')
+
+    # :type       dict[str, tuple]:  Used to cache the module names found in
+    #                                each file and project directory along
+    #                                with the directory mtime.
+    _directory_modules = {}
+
+    @classmethod
+    def is_applicable(cls, settings):
+        """Only flag imports in Python files, leaving out REPL views."""
+        syntax = os.path.splitext(os.path.basename(settings.get('syntax', '')))[0]
+        return syntax == 'Python' and not settings.get('repl', False)
+
+    def __init__(self, view):
+        """Keep track of pending modifications and unresolved imports."""
+        super().__init__(view)
+        self.pending = 0
+        self.unresolved = []
+
+    @property
+    def settings(self):
+        """Load the platform-specific plugin settings."""
+        return load_conda_settings(self.view.window())
+
+    @property
+    def environment(self):
+        """Retrieve the path of the activated conda environment."""
+        window = self.view.window()
+        if window is None or not self.settings.get('flag_unresolved_imports', True):
+            return None
+
+        return (window.project_data() or {}).get('conda_environment')
+
+    @property
+    def executable(self):
+        """Retrieve the python executable path from settings."""
+        return os.path.expanduser(self.settings.get('executable'))
+
+    @property
+    def local_modules(self):
+        """List the module names importable from the file and project directories.
+
+        Each directory is only listed again when its mtime changed.
+        """
+        cls = type(self)
+
+        directories = list(self.view.window().folders())
+        if self.view.file_name() is not None:
+            directories.append(os.path.dirname(self.view.file_name()))
+
+        modules = []
+        for directory in directories:
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+
+            cached = cls._directory_modules.get(directory)
+            if cached is None or cached[0] != mtime:
+                try:
+                    names = os.listdir(directory)
+                except OSError:
+                    names = []
+
+                cached = (mtime, frozenset(name.split('.')[0] for name in names))
+                cls._directory_modules[directory] = cached
+
+            modules.append(cached[1])
+
+        return modules
+
+    def on_load_async(self):
+        """Flag unresolved imports when the file is opened."""
+        self.flag_unresolved_imports()
+
+    def on_activated_async(self):
+        """Flag unresolved imports when the file is focused."""
+        self.flag_unresolved_imports()
+
+    def on_modified_async(self):
+        """Flag unresolved imports once typing has paused."""
+        self.pending += 1
+        sublime.set_timeout_async(self.flag_after_pause, 300)
+
+    def flag_after_pause(self):
+        """Flag unresolved imports if no modification happened in the meantime."""
+        self.pending -= 1
+        if self.pending == 0:
+            self.flag_unresolved_imports()
+
+    def flag_unresolved_imports(self):
+        """Underline every imported top-level module missing from the index.
+
+        The package that provides each unresolved module is looked up here,
+        so that hovering needs no disk access. The index of conda's package
+        caches is refreshed on its own thread, and imports are flagged again
+        once it provides new modules.
+        """
+        environment = self.environment
+        if environment is None:
+            self.view.erase_regions('conda_unresolved_imports')
+            self.unresolved = []
+            return
+
+        index = CondaModuleIndex.for_environment(environment)
+        local_modules = self.local_modules
+        text = self.view.substr(sublime.Region(0, self.view.size()))
+
+        unresolved = []
+        for statement in self.import_pattern.finditer(text):
+            if statement.group(1) is not None:
+                modules = [(statement.start(1), statement.group(1))]
+            else:
+                modules = [(statement.start(2) + module.start(1), module.group(1))
+                           for module in self.module_pattern.finditer(statement.group(2))]
+
+            for start, module in modules:
+                if (module not in index and
+                        not any(module in names for names in local_modules) and
+                        not self.view.match_selector(start, 'comment, string')):
+                    unresolved.append((sublime.Region(start, start + len(module)), module))
+
+        if unresolved:
+            CondaPackageCacheIndex.refresh_in_background(
+                self.executable,
+                lambda: sublime.set_timeout_async(self.flag_unresolved_imports, 0))
+
+            unresolved = [(region, module, CondaPackageCacheIndex.package_for(module))
+                          for region, module in unresolved]
+
+        self.unresolved = unresolved
+        self.view.add_regions('conda_unresolved_imports',
+                              [region for region, _, _ in unresolved], 'invalid', '',
+                              sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE |
+                              sublime.DRAW_SQUIGGLY_UNDERLINE)
+
+    def on_hover(self, point, hover_zone):
+        """Offer to install the package that provides an unresolved import."""
+        if hover_zone != sublime.HOVER_TEXT:
+            return
+
+        for region, module, package in self.unresolved:
+            if region.contains(point):
+                content = ("No module named '{}' in the active conda environment.<br>"
+                           "<a href=\"{}\">Install {}</a>".format(module, package, package))
+
+                self.view.show_popup(content, sublime.HIDE_ON_MOUSE_MOVE_AWAY, point,
+                                     on_navigate=self.install_package)
+                return
+
+    def install_package(self, package):
+        """Install the package through the Conda: Install Package command."""
+        self.view.hide_popup()
+        self.view.window().run_command('install_conda_package', {'package': package})